@@ -9,13 +9,52 @@ Run: python app.py
 """
 
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
-from functools import wraps
+from werkzeug.http import http_date
+from functools import wraps, lru_cache
+from typing import Annotated, Union
+from contextlib import contextmanager
+import atexit
 import os
-from datetime import datetime
+import queue
+import threading
+from datetime import date
+from decimal import Decimal
 import hashlib
+import hmac
+import time
+import uuid
+import orjson
+import msgspec
+
+# ==================== JSON ====================
+
+def _json_default(obj):
+    """Types orjson leaves to us, encoded the same way as Flask's default provider"""
+    if isinstance(obj, date):
+        return http_date(obj)
+    if isinstance(obj, (Decimal, uuid.UUID)):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, used by jsonify() and request.json"""
+    options = orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_json_default, option=self.options).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=_json_default, option=self.options)
+        return self._app.response_class(body, mimetype='application/json')
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.secret_key = os.environ.get('SECRET_KEY', 'pavishna_global_service_secret_key_2024')
 CORS(app)
 
@@ -29,16 +68,34 @@ if DATABASE_URL:
     if DATABASE_URL.startswith('postgres://'):
         DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
     
-    import psycopg2
-    from psycopg2.extras import RealDictCursor
+    from psycopg2.extras import RealDictCursor, execute_values
+    from psycopg2.pool import ThreadedConnectionPool
     
     DB_TYPE = 'postgresql'
+    # Reuse connections across requests instead of reconnecting every time.
+    # psycopg2 closes returned connections beyond minconn, so keep at least
+    # one per gunicorn thread (--threads 4) open.
+    POOL = ThreadedConnectionPool(
+        int(os.environ.get('DB_POOL_MIN', 4)),
+        int(os.environ.get('DB_POOL_MAX', 20)),
+        DATABASE_URL
+    )
     print("🐘 Using PostgreSQL Database")
 else:
     # Local Development: SQLite
     import sqlite3
     DB_TYPE = 'sqlite'
     DB_FILE = 'gsb_clients.db'
+    # Long-lived read-only connections; writes share one connection behind a lock
+    SQLITE_READERS = int(os.environ.get('SQLITE_READERS', 4))
+    # Applied on every new connection; WAL is persistent and set in init_db()
+    SQLITE_PRAGMAS = (
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA busy_timeout=5000",
+        "PRAGMA cache_size=-20000",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA foreign_keys=ON",
+    )
     print("📁 Using SQLite Database")
 
 # ==================== Password Functions ====================
@@ -50,34 +107,83 @@ def hash_password(password):
 ADMIN123_HASH = '240be518fabd2724ddb6f04eeb1da5967448d7e831c08c8fa822809f74c720a9'
 
 def verify_password(input_password, stored_password):
-    """Smart password verification"""
-    input_hash = hash_password(input_password)
-    if len(stored_password) == 64:
-        return input_hash == stored_password
-    if input_password == stored_password:
-        return True
-    return False
+    """Constant-time check against a stored SHA256 hex digest"""
+    return hmac.compare_digest(hash_password(input_password).encode(), stored_password.encode())
 
 # ==================== Database Connection ====================
 
-def get_db():
-    """Get database connection based on environment"""
+def get_db(write=False):
+    """Get database connection based on environment
+    
+    SQLite keeps one writer connection (serialized by WRITER_LOCK) and a
+    queue of reader connections so the page cache survives across requests.
+    Always hand the connection back with release_db().
+    """
     if DB_TYPE == 'postgresql':
-        conn = psycopg2.connect(DATABASE_URL)
+        conn = POOL.getconn()
         return conn
+    elif write:
+        WRITER_LOCK.acquire()
+        return WRITER
     else:
-        conn = sqlite3.connect(DB_FILE)
-        conn.row_factory = sqlite3.Row
-        return conn
+        return READERS.get()
+
+def open_sqlite(read_only=False):
+    """Open a long-lived SQLite connection shared across request threads"""
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    apply_sqlite_pragmas(conn)
+    if read_only:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+def apply_sqlite_pragmas(conn):
+    """Per-connection SQLite tuning (journal_mode is set once in init_db)"""
+    if DB_FILE == ':memory:':
+        return
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+
+def release_db(conn):
+    """Return a connection from get_db() to the pool"""
+    if DB_TYPE == 'postgresql':
+        POOL.putconn(conn)
+    elif conn is WRITER:
+        # Never hand the shared writer on with a half-finished transaction
+        if conn.in_transaction:
+            conn.rollback()
+        WRITER_LOCK.release()
+    else:
+        READERS.put(conn)
+
+@contextmanager
+def db_conn(write=False):
+    """Context manager that always releases the connection"""
+    conn = get_db(write)
+    try:
+        yield conn
+    finally:
+        release_db(conn)
+
+if DB_TYPE == 'sqlite':
+    WRITER = open_sqlite()
+    WRITER_LOCK = threading.Lock()
+    READERS = queue.Queue()
+    for _ in range(SQLITE_READERS):
+        READERS.put(open_sqlite(read_only=True))
+
+@lru_cache(maxsize=512)
+def adapt_query(query):
+    """Convert ? placeholders to %s for PostgreSQL (memoized per query string)"""
+    return query.replace('?', '%s') if DB_TYPE == 'postgresql' else query
 
 def execute_query(query, params=None, fetch=False, fetch_one=False):
     """Execute query with proper parameter placeholder handling"""
-    conn = get_db()
+    conn = get_db(write=not (fetch or fetch_one))
     
+    query = adapt_query(query)
     if DB_TYPE == 'postgresql':
         cursor = conn.cursor(cursor_factory=RealDictCursor)
-        # Convert ? to %s for PostgreSQL
-        query = query.replace('?', '%s')
     else:
         cursor = conn.cursor()
     
@@ -109,28 +215,139 @@ def execute_query(query, params=None, fetch=False, fetch_one=False):
         raise e
     finally:
         cursor.close()
-        conn.close()
+        release_db(conn)
+
+# ==================== Admin Lookup Cache ====================
+
+# Bumped whenever admin credentials change so cached rows are dropped at once;
+# the TTL bounds staleness in other worker processes.
+ADMIN_CACHE_TTL = 30
+_admin_generation = 0
+
+@lru_cache(maxsize=32)
+def _load_admin(username, generation, ttl_bucket):
+    if username is None:
+        return execute_query("SELECT id, username, password FROM admin_users LIMIT 1", fetch_one=True)
+    return execute_query("SELECT id, username, password FROM admin_users WHERE username = ?", (username,), fetch_one=True)
+
+def get_admin_cached(username=None):
+    """Admin row by username (or the first admin), memoized for ADMIN_CACHE_TTL seconds"""
+    return _load_admin(username, _admin_generation, int(time.monotonic() // ADMIN_CACHE_TTL))
+
+def invalidate_admin_cache():
+    """Drop cached admin rows after a credentials change"""
+    global _admin_generation
+    _admin_generation += 1
+    _load_admin.cache_clear()
+
+# ==================== Status Codes ====================
+# The stats filters compare SMALLINT copies of these status columns instead
+# of TEXT. The TEXT columns stay the source of truth for the UI; the *_id
+# columns are derived from them by database triggers, so every writer keeps
+# them in sync. '' maps to 0, unknown values to -1.
+
+OTHER_STATUS_ID = -1
+
+def _status_ids(*statuses):
+    return {'': 0, **{status: i for i, status in enumerate(statuses, 1)}}
+
+INTERVIEW_STATUS_IDS = _status_ids('pending', 'scheduled', 'attended', 'selected', 'passed',
+                                   'rejected', 'rescheduled', 'absent')
+VISA_STATUS_IDS = _status_ids('not_applied', 'applied', 'processing', 'approved', 'rejected')
+PASSPORT_SUBMITTED_BY_IDS = _status_ids('self', 'client', 'agency')
+
+# text column -> (code column, codes, text column DEFAULT)
+STATUS_CODE_COLUMNS = {
+    'interview_status': ('interview_status_id', INTERVIEW_STATUS_IDS, 'pending'),
+    'visa_status': ('visa_status_id', VISA_STATUS_IDS, 'not_applied'),
+    'passport_submitted_by': ('passport_submitted_by_id', PASSPORT_SUBMITTED_BY_IDS, 'self'),
+}
+
+def status_code_sql(col, codes):
+    """SQL CASE expression mapping a TEXT status column to its code"""
+    whens = ' '.join(f"WHEN {col} = '{status}' THEN {code}" for status, code in codes.items())
+    return f"CASE WHEN {col} IS NULL THEN NULL {whens} ELSE {OTHER_STATUS_ID} END"
+
+def status_code_triggers():
+    """DDL for the triggers that derive every *_id column from its TEXT column"""
+    if DB_TYPE == 'postgresql':
+        assigns = ' '.join(f"NEW.{id_col} := {status_code_sql(f'NEW.{col}', codes)};"
+                           for col, (id_col, codes, _) in STATUS_CODE_COLUMNS.items())
+        watched = ', '.join(f"{col}, {id_col}" for col, (id_col, _, _) in STATUS_CODE_COLUMNS.items())
+        return [
+            f"CREATE OR REPLACE FUNCTION clients_status_codes() RETURNS trigger AS $$ "
+            f"BEGIN {assigns} RETURN NEW; END $$ LANGUAGE plpgsql",
+            "DROP TRIGGER IF EXISTS clients_status_codes ON clients",
+            f"CREATE TRIGGER clients_status_codes BEFORE INSERT OR UPDATE OF {watched} ON clients "
+            f"FOR EACH ROW EXECUTE FUNCTION clients_status_codes()",
+        ]
+    # SQLite triggers cannot assign NEW, so they correct the row after the write
+    statements = [
+        "CREATE TRIGGER IF NOT EXISTS clients_status_codes AFTER INSERT ON clients BEGIN "
+        "UPDATE clients SET " + ', '.join(
+            f"{id_col} = {status_code_sql(f'NEW.{col}', codes)}"
+            for col, (id_col, codes, _) in STATUS_CODE_COLUMNS.items()
+        ) + " WHERE id = NEW.id; END"
+    ]
+    for col, (id_col, codes, _) in STATUS_CODE_COLUMNS.items():
+        code = status_code_sql(f'NEW.{col}', codes)
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS clients_{id_col} AFTER UPDATE OF {col}, {id_col} ON clients "
+            f"WHEN NEW.{id_col} IS NOT {code} BEGIN "
+            f"UPDATE clients SET {id_col} = {code} WHERE id = NEW.id; END"
+        )
+    return statements
 
 # ==================== Database Initialization ====================
 
+# Bump when init_db() gains new DDL or one-shot data fixes
+SCHEMA_VERSION = 4
+
+# pg_advisory_xact_lock key guarding init_db() across worker processes
+SCHEMA_LOCK_ID = 7301001
+
 def init_db():
     """Initialize database tables"""
     print("\n🔄 Initializing database...")
     
-    conn = get_db()
+    conn = get_db(write=True)
     if DB_TYPE == 'postgresql':
         cursor = conn.cursor()
+        # gunicorn workers run init_db() concurrently; serialize the migration
+        # (released when this transaction commits)
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_ID,))
         auto_increment = 'SERIAL'
         text_type = 'TEXT'
         real_type = 'DECIMAL(12,2)'
         timestamp_default = 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'
     else:
         cursor = conn.cursor()
+        # WAL is stored in the database file, so it only needs setting once
+        if DB_FILE != ':memory:':
+            cursor.execute("PRAGMA journal_mode=WAL")
+        # sqlite3 autocommits DDL; an explicit transaction makes the whole
+        # init a single commit (one fsync) like it already is on PostgreSQL.
+        # IMMEDIATE takes the write lock up front so concurrent workers
+        # migrate one at a time.
+        cursor.execute("BEGIN IMMEDIATE")
         auto_increment = 'INTEGER PRIMARY KEY AUTOINCREMENT'
         text_type = 'TEXT'
         real_type = 'REAL'
         timestamp_default = 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'
     
+    # Skip the DDL and admin repair entirely when the schema is already current
+    # (read under the lock, so a worker that waited sees the finished migration)
+    cursor.execute("CREATE TABLE IF NOT EXISTS schema_meta (version INTEGER NOT NULL)")
+    cursor.execute("SELECT version FROM schema_meta")
+    row = cursor.fetchone()
+    schema_version = row[0] if row else 0
+    if schema_version == SCHEMA_VERSION:
+        conn.commit()
+        cursor.close()
+        release_db(conn)
+        print(f"✅ Database ready! (schema v{SCHEMA_VERSION})\n")
+        return
+    
     # Create admin_users table
     if DB_TYPE == 'postgresql':
         cursor.execute('''
@@ -287,7 +504,35 @@ def init_db():
             )
         ''')
     
-    conn.commit()
+    # v2: SMALLINT status codes, indexed in place of the TEXT columns (filled
+    # in by v4). admin_users.username is indexed by its UNIQUE constraint.
+    if schema_version < 2:
+        for col, (id_col, codes, default) in STATUS_CODE_COLUMNS.items():
+            if_not_exists = 'IF NOT EXISTS ' if DB_TYPE == 'postgresql' else ''
+            cursor.execute(f"ALTER TABLE clients ADD COLUMN {if_not_exists}{id_col} SMALLINT DEFAULT {codes[default]}")
+            cursor.execute(f"DROP INDEX IF EXISTS idx_clients_{col}")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_clients_{id_col} ON clients({id_col})")
+    
+    # v3: hash legacy plaintext passwords so verify_password only compares hashes
+    if schema_version < 3:
+        cursor.execute("SELECT id, username, password FROM admin_users")
+        for user_id, username, password in cursor.fetchall():
+            if len(password) != 64:
+                cursor.execute(
+                    "UPDATE admin_users SET password = %s WHERE id = %s" if DB_TYPE == 'postgresql' else "UPDATE admin_users SET password = ? WHERE id = ?",
+                    (hash_password(password), user_id)
+                )
+                print(f"✅ Hashed plaintext password for user: {username}")
+    
+    # v4: the database derives the status codes itself; recompute them once to
+    # repair rows written by app versions that set them (or not) by hand
+    if schema_version < 4:
+        for statement in status_code_triggers():
+            cursor.execute(statement)
+        cursor.execute("UPDATE clients SET " + ', '.join(
+            f"{id_col} = {status_code_sql(col, codes)}"
+            for col, (id_col, codes, _) in STATUS_CODE_COLUMNS.items()
+        ))
     
     # Check and fix admin
     if DB_TYPE == 'postgresql':
@@ -302,7 +547,6 @@ def init_db():
             "INSERT INTO admin_users (username, password) VALUES (%s, %s)" if DB_TYPE == 'postgresql' else "INSERT INTO admin_users (username, password) VALUES (?, ?)",
             ('admin', ADMIN123_HASH)
         )
-        conn.commit()
         print("✅ Created default admin: admin / admin123")
     else:
         # Use index-based access for both SQLite and PostgreSQL
@@ -313,22 +557,57 @@ def init_db():
         # Old wrong hash that was in previous version
         OLD_WRONG_HASH = '240be518fabd2724ddb6f04eeb9d5b76d76ad8f8e5d1a62bcf2caaec2b2b8b53'
         
-        if len(stored_pass) != 64 or stored_pass == OLD_WRONG_HASH:
+        if stored_pass == OLD_WRONG_HASH:
             cursor.execute(
                 "UPDATE admin_users SET password = %s WHERE id = %s" if DB_TYPE == 'postgresql' else "UPDATE admin_users SET password = ? WHERE id = ?",
                 (ADMIN123_HASH, admin_id)
             )
-            conn.commit()
             print(f"✅ Fixed admin password for user: {admin_username}")
         else:
             print(f"✅ Admin OK: {admin_username}")
+    
+    cursor.execute("DELETE FROM schema_meta")
+    cursor.execute(
+        "INSERT INTO schema_meta (version) VALUES (%s)" if DB_TYPE == 'postgresql' else "INSERT INTO schema_meta (version) VALUES (?)",
+        (SCHEMA_VERSION,)
+    )
+    conn.commit()
+    print(f"✅ Schema migrated: v{schema_version} → v{SCHEMA_VERSION}")
     cursor.close()
-    conn.close()
+    release_db(conn)
     print("✅ Database ready!\n")
 
 # Initialize on startup
 init_db()
 
+# ==================== SQLite Maintenance ====================
+
+SQLITE_OPTIMIZE_INTERVAL = 15 * 60
+
+def optimize_sqlite():
+    """Refresh query-planner statistics; skipped if the writer stays busy"""
+    if not WRITER_LOCK.acquire(timeout=5):
+        return
+    try:
+        WRITER.execute("PRAGMA optimize")
+    except Exception as e:
+        print(f"PRAGMA optimize failed: {e}")
+    finally:
+        WRITER_LOCK.release()
+
+def schedule_sqlite_optimize():
+    """Run PRAGMA optimize every SQLITE_OPTIMIZE_INTERVAL seconds in the background"""
+    def run():
+        optimize_sqlite()
+        schedule_sqlite_optimize()
+    timer = threading.Timer(SQLITE_OPTIMIZE_INTERVAL, run)
+    timer.daemon = True
+    timer.start()
+
+if DB_TYPE == 'sqlite':
+    schedule_sqlite_optimize()
+    atexit.register(optimize_sqlite)
+
 # ==================== Decorators ====================
 
 def login_required(f):
@@ -374,20 +653,7 @@ def login():
     if not username or not password:
         return jsonify({'success': False, 'message': 'Username and password required!'})
     
-    conn = get_db()
-    if DB_TYPE == 'postgresql':
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("SELECT * FROM admin_users WHERE username = %s", (username,))
-    else:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM admin_users WHERE username = ?", (username,))
-    
-    user = cursor.fetchone()
-    if DB_TYPE == 'sqlite' and user:
-        user = dict(user)
-    
-    cursor.close()
-    conn.close()
+    user = get_admin_cached(username)
     
     if user and verify_password(password, user['password']):
         session['logged_in'] = True
@@ -400,20 +666,7 @@ def login():
 
 @app.route('/api/admin/credentials', methods=['GET'])
 def get_admin_credentials():
-    conn = get_db()
-    if DB_TYPE == 'postgresql':
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("SELECT username FROM admin_users LIMIT 1")
-    else:
-        cursor = conn.cursor()
-        cursor.execute("SELECT username FROM admin_users LIMIT 1")
-    
-    admin = cursor.fetchone()
-    if DB_TYPE == 'sqlite' and admin:
-        admin = dict(admin)
-    
-    cursor.close()
-    conn.close()
+    admin = get_admin_cached()
     
     if admin:
         return jsonify({'success': True, 'username': admin['username'], 'passwordLength': 8})
@@ -433,149 +686,316 @@ def change_admin_credentials():
     if not new_password or len(new_password) < 6:
         return jsonify({'success': False, 'message': 'Password must be at least 6 characters!'})
     
-    conn = get_db()
-    if DB_TYPE == 'postgresql':
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("SELECT * FROM admin_users LIMIT 1")
-    else:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM admin_users LIMIT 1")
-    
-    admin = cursor.fetchone()
-    if DB_TYPE == 'sqlite' and admin:
-        admin = dict(admin)
+    # Read uncached: another worker may hold a row that predates a password change
+    admin = execute_query("SELECT id, username, password FROM admin_users LIMIT 1", fetch_one=True)
     
     if not admin:
-        cursor.close()
-        conn.close()
         return jsonify({'success': False, 'message': 'No admin account found!'})
     
     if not verify_password(current_password, admin['password']):
-        cursor.close()
-        conn.close()
         return jsonify({'success': False, 'message': 'Current password is incorrect!'})
     
     new_hash = hash_password(new_password)
     
-    if DB_TYPE == 'postgresql':
-        cursor.execute(
-            "UPDATE admin_users SET username = %s, password = %s, updated_at = %s WHERE id = %s",
-            (new_username, new_hash, datetime.now().isoformat(), admin['id'])
-        )
-    else:
-        cursor.execute(
-            "UPDATE admin_users SET username = ?, password = ?, updated_at = ? WHERE id = ?",
-            (new_username, new_hash, datetime.now().isoformat(), admin['id'])
-        )
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with db_conn(write=True) as conn:
+        cursor = conn.cursor()
+        if DB_TYPE == 'postgresql':
+            cursor.execute(
+                "UPDATE admin_users SET username = %s, password = %s, updated_at = NOW() WHERE id = %s",
+                (new_username, new_hash, admin['id'])
+            )
+        else:
+            cursor.execute(
+                "UPDATE admin_users SET username = ?, password = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (new_username, new_hash, admin['id'])
+            )
+        
+        conn.commit()
+        cursor.close()
+    invalidate_admin_cache()
     
     session['username'] = new_username
     return jsonify({'success': True, 'message': 'Credentials updated successfully!'})
 
 # ==================== Clients API ====================
 
+CLIENT_COLUMNS = ('name', 'phone', 'district', 'job_role', 'country', 'passport_no', 
+                  'passport_submit_date', 'passport_submitted_by', 'passport_fee',
+                  'passport_payment_mode', 'passport_payment_status', 'passport_payment_date',
+                  'passport_payment_reference', 'interview_date', 'interview_time',
+                  'interview_location', 'interview_status', 'interview_reschedule_date',
+                  'interview_remarks', 'offer_letter_status', 'offer_letter_date',
+                  'offer_letter_reference', 'employer_company', 'offered_salary',
+                  'contract_duration', 'advance_payment', 'advance_payment_mode',
+                  'advance_payment_status', 'advance_payment_date', 'advance_payment_time',
+                  'advance_payment_reference', 'medical_status', 'medical_date',
+                  'medical_report_no', 'mofa_status', 'mofa_number', 'mofa_date',
+                  'vfs_status', 'vfs_appointment_date', 'vfs_reference_no',
+                  'takamual_status', 'takamual_date', 'takamual_certificate_no',
+                  'visa_status', 'visa_number', 'visa_expiry_date', 'agreement_process',
+                  'agreement_date', 'agreement_number', 'client_signed', 'witness_name',
+                  'full_payment', 'full_payment_mode', 'full_payment_date', 'flying_date',
+                  'flight_details', 'ticket_status', 'remarks')
+
+NUMERIC_COLUMNS = frozenset({'advance_payment', 'full_payment', 'passport_fee'})
+
+# SQL fragments built once at import instead of on every write request
+SQL_PLACEHOLDER = '%s' if DB_TYPE == 'postgresql' else '?'
+CLIENT_PLACEHOLDERS = tuple(', '.join([SQL_PLACEHOLDER] * n) for n in range(len(CLIENT_COLUMNS) + 1))
+CLIENT_SET_CLAUSES = {col: f"{col} = {SQL_PLACEHOLDER}" for col in CLIENT_COLUMNS}
+# The database stamps updated_at itself, so every replica agrees on the clock
+SQL_NOW_UPDATE = "updated_at = NOW()" if DB_TYPE == 'postgresql' else "updated_at = CURRENT_TIMESTAMP"
+
+# Amounts may arrive as strings from the form; accepts '' or any numeric float()
+# literal (sign, '.5', '5.', exponent) but not nan/inf
+NumericStr = Annotated[str, msgspec.Meta(pattern=r'^(\s*[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?\s*)?$')]
+
+# Request bodies for the client write endpoints are decoded and type-checked by
+# msgspec in one pass. Fields left out of the JSON stay UNSET and are dropped,
+# so handlers only see the keys the caller actually sent.
+ClientIn = msgspec.defstruct(
+    'ClientIn',
+    [(col,
+      Union[float, NumericStr, None, msgspec.UnsetType] if col in NUMERIC_COLUMNS
+      else Union[str, int, float, bool, None, msgspec.UnsetType],
+      msgspec.UNSET)
+     for col in CLIENT_COLUMNS],
+    omit_defaults=True
+)
+CLIENT_DECODER = msgspec.json.Decoder(ClientIn)
+CLIENT_LIST_DECODER = msgspec.json.Decoder(list[ClientIn])
+
+def decode_clients(decoder):
+    """Decode the request body into plain dicts holding only the provided fields"""
+    return msgspec.to_builtins(decoder.decode(request.get_data()))
+
+@app.errorhandler(msgspec.DecodeError)
+def invalid_client_data(e):
+    return jsonify({'success': False, 'message': f'Invalid client data: {e}'}), 400
+
+# Full client record as served by the API; leaves out the internal *_id status codes
+CLIENT_RECORD_SELECT = f"SELECT {', '.join(('id',) + CLIENT_COLUMNS + ('created_at', 'updated_at'))} FROM clients"
+
+# Columns returned by the paginated list; full records come from /api/clients/<id>
+CLIENT_LIST_COLUMNS = ['id', 'name', 'phone', 'district', 'job_role', 'country',
+                       'interview_status', 'visa_status', 'flying_date',
+                       'advance_payment', 'full_payment', 'created_at']
+
+CLIENT_PAGE_DEFAULT = 100
+CLIENT_PAGE_MAX = 500
+
+# Rows fetched and encoded per chunk when streaming the full client list
+CLIENT_STREAM_BATCH = 2000
+
+# INSERT ... RETURNING id works on PostgreSQL and on SQLite 3.35+
+INSERT_RETURNING = DB_TYPE == 'postgresql' or sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Rows per multi-row INSERT; on SQLite also capped by its bound-parameter
+# limit (32766 since 3.32)
+BULK_INSERT_BATCH = 500
+SQLITE_MAX_PARAMS = 32766
+
+def prepare_client_insert(data):
+    """Pick the provided client columns and coerce their values for INSERT"""
+    cols = [col for col in CLIENT_COLUMNS if data.get(col) is not None]
+    vals = [(float(data[col]) if data[col] else 0) if col in NUMERIC_COLUMNS
+            else (str(data[col]) if data[col] else '')
+            for col in cols]
+    return cols, vals
+
 @app.route('/api/clients', methods=['GET'])
 @login_required
 def get_clients():
-    conn = get_db()
-    if DB_TYPE == 'postgresql':
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-    else:
-        cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM clients ORDER BY id DESC")
-    clients = cursor.fetchall()
+    limit = request.args.get('limit', type=int)
+    before_id = request.args.get('cursor', type=int)
+    
+    if limit is None and before_id is None:
+        # Full records, as the dashboard edits clients straight from this list
+        return stream_all_clients()
+    
+    # Paginated summary: list columns only, keyset on the primary key
+    limit = max(1, min(limit or CLIENT_PAGE_DEFAULT, CLIENT_PAGE_MAX))
+    query = f"SELECT {', '.join(CLIENT_LIST_COLUMNS)} FROM clients"
+    params = []
+    if before_id is not None:
+        query += f" WHERE id < {SQL_PLACEHOLDER}"
+        params.append(before_id)
+    query += f" ORDER BY id DESC LIMIT {SQL_PLACEHOLDER}"
+    params.append(limit)
+    
+    with db_conn() as conn:
+        if DB_TYPE == 'postgresql':
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+        else:
+            cursor = conn.cursor()
+        cursor.execute(query, params)
+        clients = [dict(row) for row in cursor.fetchall()]
+        cursor.close()
     
-    if DB_TYPE == 'sqlite':
-        clients = [dict(row) for row in clients]
-    else:
-        clients = [dict(row) for row in clients]
+    next_cursor = clients[-1]['id'] if len(clients) == limit else None
+    return jsonify({'clients': clients, 'next_cursor': next_cursor})
+
+def stream_all_clients():
+    """Stream every client as a JSON array without materializing the result set
     
-    cursor.close()
-    conn.close()
-    return jsonify(clients)
+    PostgreSQL uses a named (server-side) cursor fetched CLIENT_STREAM_BATCH
+    rows at a time; the connection is held until the response is closed,
+    which also happens when the body is never iterated (e.g. HEAD requests).
+    """
+    conn = get_db()
+    try:
+        if DB_TYPE == 'postgresql':
+            cursor = conn.cursor(name='clients_stream', cursor_factory=RealDictCursor)
+        else:
+            cursor = conn.cursor()
+        cursor.execute(f"{CLIENT_RECORD_SELECT} ORDER BY id DESC")
+    except Exception:
+        release_db(conn)
+        raise
+    
+    released = []
+    
+    def close():
+        if not released:
+            released.append(True)
+            cursor.close()
+            release_db(conn)
+    
+    def generate():
+        try:
+            yield b'['
+            separator = b''
+            while True:
+                rows = cursor.fetchmany(CLIENT_STREAM_BATCH)
+                if not rows:
+                    break
+                yield separator + b','.join(
+                    orjson.dumps(dict(row), default=_json_default, option=OrjsonProvider.options)
+                    for row in rows
+                )
+                separator = b','
+            yield b']'
+        finally:
+            close()
+    
+    response = app.response_class(generate(), mimetype='application/json')
+    response.call_on_close(close)
+    return response
 
 @app.route('/api/clients', methods=['POST'])
 @login_required
 def add_client():
-    data = request.json
+    data = decode_clients(CLIENT_DECODER)
     
-    columns = ['name', 'phone', 'district', 'job_role', 'country', 'passport_no', 
-               'passport_submit_date', 'passport_submitted_by', 'passport_fee',
-               'passport_payment_mode', 'passport_payment_status', 'passport_payment_date',
-               'passport_payment_reference', 'interview_date', 'interview_time',
-               'interview_location', 'interview_status', 'interview_reschedule_date',
-               'interview_remarks', 'offer_letter_status', 'offer_letter_date',
-               'offer_letter_reference', 'employer_company', 'offered_salary',
-               'contract_duration', 'advance_payment', 'advance_payment_mode',
-               'advance_payment_status', 'advance_payment_date', 'advance_payment_time',
-               'advance_payment_reference', 'medical_status', 'medical_date',
-               'medical_report_no', 'mofa_status', 'mofa_number', 'mofa_date',
-               'vfs_status', 'vfs_appointment_date', 'vfs_reference_no',
-               'takamual_status', 'takamual_date', 'takamual_certificate_no',
-               'visa_status', 'visa_number', 'visa_expiry_date', 'agreement_process',
-               'agreement_date', 'agreement_number', 'client_signed', 'witness_name',
-               'full_payment', 'full_payment_mode', 'full_payment_date', 'flying_date',
-               'flight_details', 'ticket_status', 'remarks']
-    
-    cols, vals, placeholders = [], [], []
-    for col in columns:
-        if col in data and data[col] is not None:
-            cols.append(col)
-            val = data[col]
-            if col in ['advance_payment', 'full_payment', 'passport_fee']:
-                vals.append(float(val) if val else 0)
-            else:
-                vals.append(str(val) if val else '')
-            placeholders.append('%s' if DB_TYPE == 'postgresql' else '?')
+    cols, vals = prepare_client_insert(data)
     
     if not cols:
         return jsonify({'success': False, 'message': 'No data provided'})
     
-    query = f"INSERT INTO clients ({', '.join(cols)}) VALUES ({', '.join(placeholders)})"
+    query = f"INSERT INTO clients ({', '.join(cols)}) VALUES ({CLIENT_PLACEHOLDERS[len(cols)]})"
     
-    conn = get_db()
-    if DB_TYPE == 'postgresql':
-        cursor = conn.cursor()
+    if INSERT_RETURNING:
         query += " RETURNING id"
-    else:
-        cursor = conn.cursor()
+    
+    conn = get_db(write=True)
+    cursor = conn.cursor()
     
     try:
         cursor.execute(query, vals)
-        if DB_TYPE == 'postgresql':
-            new_id = cursor.fetchone()[0]
-        else:
-            new_id = cursor.lastrowid
+        new_id = cursor.fetchone()[0] if INSERT_RETURNING else cursor.lastrowid
         conn.commit()
         cursor.close()
-        conn.close()
+        release_db(conn)
         return jsonify({'success': True, 'id': new_id, 'message': 'Client added successfully!'})
     except Exception as e:
         cursor.close()
-        conn.close()
+        release_db(conn)
         return jsonify({'success': False, 'message': str(e)})
 
-@app.route('/api/clients/<int:client_id>', methods=['GET'])
+@app.route('/api/clients/bulk', methods=['POST'])
 @login_required
-def get_client(client_id):
-    conn = get_db()
-    if DB_TYPE == 'postgresql':
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("SELECT * FROM clients WHERE id = %s", (client_id,))
-    else:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM clients WHERE id = ?", (client_id,))
+def add_clients_bulk():
+    data = decode_clients(CLIENT_LIST_DECODER)
+    
+    if not data:
+        return jsonify({'success': False, 'message': 'Expected a non-empty list of clients'})
+    
+    # Runs of consecutive rows with the same column set become one multi-row
+    # INSERT, so omitted columns still get their table DEFAULTs and ids are
+    # assigned in input order
+    groups = []
+    for index, row in enumerate(data):
+        cols, vals = prepare_client_insert(row)
+        if not cols:
+            return jsonify({'success': False, 'message': f'Row {index}: no data provided'})
+        if groups and groups[-1][0] == tuple(cols):
+            groups[-1][1].append((index, vals))
+        else:
+            groups.append((tuple(cols), [(index, vals)]))
     
-    client = cursor.fetchone()
-    if DB_TYPE == 'sqlite' and client:
-        client = dict(client)
+    new_ids = [None] * len(data)
+    conn = get_db(write=True)
+    cursor = conn.cursor()
     
-    cursor.close()
-    conn.close()
+    try:
+        for cols, rows in groups:
+            col_list = ', '.join(cols)
+            if DB_TYPE == 'postgresql':
+                # psycopg2 expands VALUES %s into BULK_INSERT_BATCH-row pages
+                returned = execute_values(
+                    cursor,
+                    f"INSERT INTO clients ({col_list}) VALUES %s RETURNING id",
+                    [vals for _, vals in rows],
+                    page_size=BULK_INSERT_BATCH,
+                    fetch=True
+                )
+                # RETURNING order is unspecified, but ids rise in VALUES order
+                for (index, _), new_id in zip(rows, sorted(row[0] for row in returned)):
+                    new_ids[index] = new_id
+            elif INSERT_RETURNING:
+                # One statement per batch: VALUES (...), (...), ... RETURNING id
+                row_placeholder = f"({CLIENT_PLACEHOLDERS[len(cols)]})"
+                batch_size = min(BULK_INSERT_BATCH, SQLITE_MAX_PARAMS // len(cols))
+                for start in range(0, len(rows), batch_size):
+                    batch = rows[start:start + batch_size]
+                    query = (f"INSERT INTO clients ({col_list}) VALUES "
+                             f"{', '.join([row_placeholder] * len(batch))} RETURNING id")
+                    cursor.execute(query, [v for _, vals in batch for v in vals])
+                    for (index, _), new_id in zip(batch, sorted(row[0] for row in cursor.fetchall())):
+                        new_ids[index] = new_id
+            else:
+                # SQLite older than 3.35: per-row inserts in one transaction
+                query = f"INSERT INTO clients ({col_list}) VALUES ({CLIENT_PLACEHOLDERS[len(cols)]})"
+                for index, vals in rows:
+                    cursor.execute(query, vals)
+                    new_ids[index] = cursor.lastrowid
+        conn.commit()
+        cursor.close()
+        release_db(conn)
+        return jsonify({'success': True, 'ids': new_ids, 'count': len(new_ids),
+                        'message': f'{len(new_ids)} clients added successfully!'})
+    except Exception as e:
+        conn.rollback()
+        cursor.close()
+        release_db(conn)
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/api/clients/<int:client_id>', methods=['GET'])
+@login_required
+def get_client(client_id):
+    with db_conn() as conn:
+        if DB_TYPE == 'postgresql':
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute(f"{CLIENT_RECORD_SELECT} WHERE id = %s", (client_id,))
+        else:
+            cursor = conn.cursor()
+            cursor.execute(f"{CLIENT_RECORD_SELECT} WHERE id = ?", (client_id,))
+        
+        client = cursor.fetchone()
+        if DB_TYPE == 'sqlite' and client:
+            client = dict(client)
+        
+        cursor.close()
     
     if client:
         return jsonify(dict(client))
@@ -584,83 +1004,56 @@ def get_client(client_id):
 @app.route('/api/clients/<int:client_id>', methods=['PUT'])
 @login_required
 def update_client(client_id):
-    data = request.json
+    data = decode_clients(CLIENT_DECODER)
     
-    columns = ['name', 'phone', 'district', 'job_role', 'country', 'passport_no', 
-               'passport_submit_date', 'passport_submitted_by', 'passport_fee',
-               'passport_payment_mode', 'passport_payment_status', 'passport_payment_date',
-               'passport_payment_reference', 'interview_date', 'interview_time',
-               'interview_location', 'interview_status', 'interview_reschedule_date',
-               'interview_remarks', 'offer_letter_status', 'offer_letter_date',
-               'offer_letter_reference', 'employer_company', 'offered_salary',
-               'contract_duration', 'advance_payment', 'advance_payment_mode',
-               'advance_payment_status', 'advance_payment_date', 'advance_payment_time',
-               'advance_payment_reference', 'medical_status', 'medical_date',
-               'medical_report_no', 'mofa_status', 'mofa_number', 'mofa_date',
-               'vfs_status', 'vfs_appointment_date', 'vfs_reference_no',
-               'takamual_status', 'takamual_date', 'takamual_certificate_no',
-               'visa_status', 'visa_number', 'visa_expiry_date', 'agreement_process',
-               'agreement_date', 'agreement_number', 'client_signed', 'witness_name',
-               'full_payment', 'full_payment_mode', 'full_payment_date', 'flying_date',
-               'flight_details', 'ticket_status', 'remarks']
-    
-    updates, vals = [], []
-    placeholder = '%s' if DB_TYPE == 'postgresql' else '?'
-    
-    for col in columns:
-        if col in data:
-            updates.append(f"{col} = {placeholder}")
-            val = data[col]
-            if col in ['advance_payment', 'full_payment', 'passport_fee']:
-                vals.append(float(val) if val else 0)
-            else:
-                vals.append(val if val else '')
+    cols = [col for col in CLIENT_COLUMNS if col in data]
+    vals = [(float(data[col]) if data[col] else 0) if col in NUMERIC_COLUMNS
+            else (data[col] if data[col] else '')
+            for col in cols]
+    updates = [CLIENT_SET_CLAUSES[col] for col in cols]
     
-    updates.append(f"updated_at = {placeholder}")
-    vals.append(datetime.now().isoformat())
+    updates.append(SQL_NOW_UPDATE)
     vals.append(client_id)
     
-    query = f"UPDATE clients SET {', '.join(updates)} WHERE id = {placeholder}"
+    query = f"UPDATE clients SET {', '.join(updates)} WHERE id = {SQL_PLACEHOLDER}"
     
-    conn = get_db()
+    conn = get_db(write=True)
     cursor = conn.cursor()
     
     try:
         cursor.execute(query, vals)
         conn.commit()
         cursor.close()
-        conn.close()
+        release_db(conn)
         return jsonify({'success': True, 'message': 'Client updated successfully!'})
     except Exception as e:
         cursor.close()
-        conn.close()
+        release_db(conn)
         return jsonify({'success': False, 'message': str(e)})
 
 @app.route('/api/clients/<int:client_id>', methods=['DELETE'])
 @login_required
 def delete_client(client_id):
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    if DB_TYPE == 'postgresql':
-        cursor.execute("DELETE FROM clients WHERE id = %s", (client_id,))
-    else:
-        cursor.execute("DELETE FROM clients WHERE id = ?", (client_id,))
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with db_conn(write=True) as conn:
+        cursor = conn.cursor()
+        
+        if DB_TYPE == 'postgresql':
+            cursor.execute("DELETE FROM clients WHERE id = %s", (client_id,))
+        else:
+            cursor.execute("DELETE FROM clients WHERE id = ?", (client_id,))
+        
+        conn.commit()
+        cursor.close()
     return jsonify({'success': True, 'message': 'Client deleted successfully!'})
 
 @app.route('/api/clients/clear', methods=['DELETE'])
 @login_required
 def clear_all_clients():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM clients")
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with db_conn(write=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM clients")
+        conn.commit()
+        cursor.close()
     return jsonify({'success': True, 'message': 'All clients deleted!'})
 
 # ==================== Stats API ====================
@@ -668,42 +1061,49 @@ def clear_all_clients():
 @app.route('/api/stats', methods=['GET'])
 @login_required
 def get_stats():
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    stats = {}
-    
-    cursor.execute("SELECT COUNT(*) FROM clients")
-    stats['total_clients'] = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM clients WHERE interview_status IN ('pending', 'scheduled')")
-    stats['interview_pending'] = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM clients WHERE interview_status IN ('selected', 'passed')")
-    stats['interview_passed'] = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM clients WHERE visa_status = 'approved'")
-    stats['visa_approved'] = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM clients WHERE visa_status NOT IN ('approved', 'rejected', 'not_applied', '')")
-    stats['visa_processing'] = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COALESCE(SUM(advance_payment), 0) FROM clients")
-    stats['total_advance'] = float(cursor.fetchone()[0] or 0)
-    
-    cursor.execute("SELECT COALESCE(SUM(full_payment), 0) FROM clients")
-    stats['total_full_payment'] = float(cursor.fetchone()[0] or 0)
-    
-    cursor.execute("SELECT COALESCE(SUM(passport_fee), 0) FROM clients WHERE passport_submitted_by = 'agency'")
-    stats['total_passport_fee'] = float(cursor.fetchone()[0] or 0)
+    if DB_TYPE == 'postgresql':
+        count_if = lambda cond: f"COUNT(*) FILTER (WHERE {cond})"
+        sum_if = lambda col, cond: f"COALESCE(SUM({col}) FILTER (WHERE {cond}), 0)"
+    else:
+        count_if = lambda cond: f"COALESCE(SUM(CASE WHEN {cond} THEN 1 ELSE 0 END), 0)"
+        sum_if = lambda col, cond: f"COALESCE(SUM(CASE WHEN {cond} THEN {col} ELSE 0 END), 0)"
+    
+    interview, visa = INTERVIEW_STATUS_IDS, VISA_STATUS_IDS
+    
+    # One scan, one round trip for every dashboard figure
+    query = f"""
+        SELECT
+            COUNT(*),
+            {count_if(f"interview_status_id IN ({interview['pending']}, {interview['scheduled']})")},
+            {count_if(f"interview_status_id IN ({interview['selected']}, {interview['passed']})")},
+            {count_if(f"visa_status_id = {visa['approved']}")},
+            {count_if(f"visa_status_id NOT IN ({visa['approved']}, {visa['rejected']}, {visa['not_applied']}, {visa['']})")},
+            COALESCE(SUM(advance_payment), 0),
+            COALESCE(SUM(full_payment), 0),
+            {sum_if("passport_fee", f"passport_submitted_by_id = {PASSPORT_SUBMITTED_BY_IDS['agency']}")},
+            {count_if(f"visa_status_id = {visa['approved']} AND flying_date IS NOT NULL AND flying_date != ''")}
+        FROM clients
+    """
+    
+    with db_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query)
+        row = cursor.fetchone()
+        cursor.close()
     
+    stats = {
+        'total_clients': row[0],
+        'interview_pending': row[1],
+        'interview_passed': row[2],
+        'visa_approved': row[3],
+        'visa_processing': row[4],
+        'total_advance': float(row[5] or 0),
+        'total_full_payment': float(row[6] or 0),
+        'total_passport_fee': float(row[7] or 0),
+        'ready_to_fly': row[8],
+    }
     stats['total_revenue'] = stats['total_advance'] + stats['total_full_payment'] + stats['total_passport_fee']
     
-    cursor.execute("SELECT COUNT(*) FROM clients WHERE visa_status = 'approved' AND flying_date IS NOT NULL AND flying_date != ''")
-    stats['ready_to_fly'] = cursor.fetchone()[0]
-    
-    cursor.close()
-    conn.close()
     return jsonify(stats)
 
 # ==================== Health Check for Render ====================